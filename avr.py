@@ -6,7 +6,7 @@ A background service to detect keyboard shortcuts and trigger actions.
 
 This module provides functionality to:
 1. Detect keyboard shortcuts (configurable)
-2. Capture screenshots (using pyscreenshot)
+2. Capture screenshots (using mss)
 3. Analyze images using OpenAI's Vision API (gpt-4o)
 4. Save analysis to knowledge base (if configured)
 5. Provide audio feedback on action events (start, complete, error)
@@ -17,18 +17,28 @@ Project: The Hackers Playbook, Valuable Internal Tools (VIT)
 
 from pynput import keyboard
 import argparse
+import string
 import sys
 from typing import Callable, Optional, Literal
-import pyscreenshot
+import mss
+from PIL import Image, features
+import numpy as np
 import base64
+import hashlib
+import re
+import sqlite3
 from io import BytesIO
 from openai import OpenAI
+import httpx
 import os
 import dotenv
 from datetime import datetime
 import platform
+import ctypes
 import time
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 from queue import Queue
 import threading
 import queue
@@ -36,9 +46,46 @@ import pyperclip
 
 dotenv.load_dotenv()
 
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Long-lived HTTP/2 client so hotkey triggers reuse a warm TLS connection
+http_client = httpx.Client(
+    http2=True,
+    timeout=httpx.Timeout(60.0, connect=5.0),
+    limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=600),
+)
+openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client)
 knowledge_source_path = os.getenv("KNOWLEDGE_SOURCE_PATH")
 
+VISION_MODEL = "gpt-4o"
+JPEG_QUALITY = 75
+WEBP_QUALITY = 80
+WEBP_METHOD = 4
+
+# Screenshot codec: WebP where this Pillow build supports it, JPEG otherwise
+if features.check("webp"):
+    SCREENSHOT_FORMAT = "WEBP"
+    SCREENSHOT_MIME = "image/webp"
+    SCREENSHOT_SAVE_OPTIONS = {"quality": WEBP_QUALITY, "method": WEBP_METHOD}
+else:
+    SCREENSHOT_FORMAT = "JPEG"
+    SCREENSHOT_MIME = "image/jpeg"
+    SCREENSHOT_SAVE_OPTIONS = {"quality": JPEG_QUALITY, "optimize": True}
+
+ANALYSIS_CACHE_FILE = ".analysis_cache.sqlite"
+ANALYSIS_CACHE_MAX_ENTRIES = 5000
+ANALYSIS_CACHE_EVICT_BATCH = 100
+# Captures whose difference hashes differ in fewer bits are treated as the same screen
+DHASH_THRESHOLD = 5
+
+# Per-model image limits: (max long side, max short side, tile size).
+# The API downsizes anything larger before tiling, so sending more pixels
+# only costs encode time and upload bandwidth.
+TILE_TABLE = {
+    "gpt-4o": (2048, 768, 512),
+    "gpt-4o-mini": (2048, 768, 512),
+}
+# Largest extra shrink accepted to land a side on a tile boundary
+TILE_SNAP_MAX_SHRINK = 0.15
+
 SYSTEM_PROMPT = """You are an expert at extracting and organizing information from images.
 Extract and format the following in markdown, treating each visually distinct section as a separate block:
 
@@ -87,8 +134,210 @@ Format your response as:
 [Overall context of the image, how blocks relate to each other]
 """
 
+TEXT_PROMPT_PREFIX = f"{SYSTEM_PROMPT}\n\nAnalyze this text:\n"
+
+BATCH_PROMPT = (
+    """You will receive several screenshots. Analyze each screenshot separately, in the order given,
+and write one complete response per screenshot. Start every response with its own "# ID" heading.
+
+"""
+    + SYSTEM_PROMPT
+)
+
+AUDIO_TOOLBOX_PATH = "/System/Library/Frameworks/AudioToolbox.framework/AudioToolbox"
+CORE_FOUNDATION_PATH = (
+    "/System/Library/Frameworks/CoreFoundation.framework/CoreFoundation"
+)
+SOUND_FILES = {
+    "start": "/System/Library/Sounds/Ping.aiff",
+    "complete": "/System/Library/Sounds/Glass.aiff",
+    "error": "/System/Library/Sounds/Basso.aiff",
+}
+
+
+def _load_system_sounds() -> tuple:
+    """
+    Register the macOS event sounds with AudioToolbox once.
+
+    Returns:
+        tuple: AudioToolbox library (or None) and a dict of sound type to SystemSoundID
+    """
+    try:
+        audio_toolbox = ctypes.cdll.LoadLibrary(AUDIO_TOOLBOX_PATH)
+        core_foundation = ctypes.cdll.LoadLibrary(CORE_FOUNDATION_PATH)
+    except OSError as e:
+        print(f"Failed to load AudioToolbox, falling back to afplay: {e}")
+        return None, {}
+
+    create_url = core_foundation.CFURLCreateFromFileSystemRepresentation
+    create_url.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_char_p,
+        ctypes.c_long,
+        ctypes.c_bool,
+    ]
+    create_url.restype = ctypes.c_void_p
+    core_foundation.CFRelease.argtypes = [ctypes.c_void_p]
+    audio_toolbox.AudioServicesCreateSystemSoundID.argtypes = [
+        ctypes.c_void_p,
+        ctypes.POINTER(ctypes.c_uint32),
+    ]
+    audio_toolbox.AudioServicesCreateSystemSoundID.restype = ctypes.c_int32
+    audio_toolbox.AudioServicesPlaySystemSound.argtypes = [ctypes.c_uint32]
+    audio_toolbox.AudioServicesPlaySystemSound.restype = None
+
+    sound_ids = {}
+    for sound_type, path in SOUND_FILES.items():
+        encoded_path = path.encode()
+        url = create_url(None, encoded_path, len(encoded_path), False)
+        if not url:
+            continue
+        sound_id = ctypes.c_uint32()
+        status = audio_toolbox.AudioServicesCreateSystemSoundID(
+            url, ctypes.byref(sound_id)
+        )
+        core_foundation.CFRelease(url)
+        if status == 0:
+            sound_ids[sound_type] = sound_id.value
+    return audio_toolbox, sound_ids
+
+
+def _dhash(image: Image.Image) -> int:
+    """
+    Compute a 64-bit difference hash of an image.
+
+    Args:
+        image (Image.Image): Image to hash
+
+    Returns:
+        int: Hash whose bits record whether each pixel is brighter than its left neighbour
+    """
+    # Shrink before converting to grayscale so only 72 pixels are converted
+    small = image.resize((9, 8), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    pixels = np.asarray(small.convert("L"))
+    bits = np.packbits(pixels[:, 1:] > pixels[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big")
+
+
+def _hamming(a: int, b: int) -> int:
+    """
+    Count the bits that differ between two hashes.
+
+    Args:
+        a (int): First hash
+        b (int): Second hash
+
+    Returns:
+        int: Hamming distance
+    """
+    return bin(a ^ b).count("1")
+
+
+_CMD_KEY = keyboard.Key.cmd
+
+# One bit per key name, so the pressed-key state is a single int
+KEY_BITS = {
+    name: 1 << i
+    for i, name in enumerate(
+        ["cmd", "ctrl", "shift", "alt", *string.ascii_lowercase, *string.digits]
+    )
+}
+
+
+def _key_bit(name) -> int:
+    """
+    Get the bit for a key name, assigning the next free bit to unseen keys.
+
+    Args:
+        name: Key name (usually a character)
+
+    Returns:
+        int: Bit representing the key
+    """
+    bit = KEY_BITS.get(name)
+    if bit is None:
+        bit = KEY_BITS[name] = 1 << len(KEY_BITS)
+    return bit
+
+
 if platform.system() == "Windows":
     import winsound
+elif platform.system() == "Darwin":
+    audio_toolbox, system_sound_ids = _load_system_sounds()
+
+
+@lru_cache(maxsize=8)
+def _parse_hotkey_cached(hotkey: str) -> frozenset:
+    """
+    Convert hotkey string to set of keys, memoized per hotkey string.
+
+    Args:
+        hotkey (str): String representation of hotkey (e.g., "cmd+x")
+
+    Returns:
+        frozenset: Set of individual keys
+    """
+    return frozenset(hotkey.lower().replace("command+", "cmd+").split("+"))
+
+
+def _image_part(base64_img: str) -> dict:
+    """
+    Build the chat message part for a screenshot.
+
+    Args:
+        base64_img (str): Base64 encoded screenshot
+
+    Returns:
+        dict: image_url content part
+    """
+    return {
+        "type": "image_url",
+        "image_url": {"url": f"data:{SCREENSHOT_MIME};base64,{base64_img}"},
+    }
+
+
+def _split_analyses(text: str) -> list:
+    """
+    Split a batched analysis into one analysis per screenshot.
+
+    Args:
+        text (str): Analysis covering several screenshots
+
+    Returns:
+        list: Sections that start with an "# ID" heading
+    """
+    parts = re.split(r"(?m)^(?=# ID[ \t]*$)", text)
+    return [part.strip() for part in parts if part.lstrip().startswith("# ID")]
+
+
+def _tile_target_size(width: int, height: int, model: str = VISION_MODEL) -> tuple:
+    """
+    Compute the largest image size the vision model will actually use.
+
+    The image is fit within the model's long and short side limits. If a side
+    then spills slightly past a tile boundary, it is shrunk a little further
+    so that the partial row or column of tiles is not billed.
+
+    Args:
+        width (int): Source image width
+        height (int): Source image height
+        model (str): Vision model the image is sent to
+
+    Returns:
+        tuple: Target (width, height), never larger than the source
+    """
+    max_long, max_short, tile = TILE_TABLE.get(model, TILE_TABLE[VISION_MODEL])
+    scale = min(1.0, max_long / max(width, height), max_short / min(width, height))
+
+    snap = 1.0
+    for side in (width * scale, height * scale):
+        if side > tile and side % tile:
+            candidate = (side // tile * tile) / side
+            if candidate >= 1.0 - TILE_SNAP_MAX_SHRINK:
+                snap = min(snap, candidate)
+    scale *= snap
+
+    return max(1, round(width * scale)), max(1, round(height * scale))
 
 
 class HotkeyService:
@@ -99,9 +348,9 @@ class HotkeyService:
     image analysis, and knowledge base storage.
 
     Attributes:
-        hotkey (set): Set of keys that trigger the action
+        hotkey (frozenset): Set of keys that trigger the action
         callback (Callable): Function to call when hotkey is pressed
-        current_keys (set): Currently pressed keys
+        _mask (int): Bitmask of currently pressed keys
     """
 
     def __init__(self, hotkey: str = "command+x", callback: Optional[Callable] = None):
@@ -113,27 +362,69 @@ class HotkeyService:
             callback (Optional[Callable]): Function to call when hotkey is pressed
         """
         self.hotkey = self._parse_hotkey(hotkey)
-        self.current_keys = set()
-        self.last_trigger_time = 0
+        self._mask = 0
         self.TRIGGER_COOLDOWN = 0.5
+        self._cooldown_ns = int(self.TRIGGER_COOLDOWN * 1_000_000_000)
+        self._last_trigger_ns = 0
 
         # Queue configuration
         self.MAX_QUEUE_SIZE = 10
+        self.COALESCE_WINDOW = 5.0
+        self.MAX_BATCH_SIZE = 4
         self.processing_queue = Queue(maxsize=self.MAX_QUEUE_SIZE)
-        self.executor = ThreadPoolExecutor(max_workers=3)
+        # (dhash, enqueued_at) of the newest screenshot still being processed
+        self._queue_lock = threading.Lock()
+        self._inflight_screenshot = None
+        self.MAX_WORKERS = 3
+        self.executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS)
+        # Items are only taken off the queue when a worker is free, so a
+        # backlog stays in processing_queue where screenshots can be batched
+        self._worker_slots = threading.Semaphore(self.MAX_WORKERS)
+        # Separate worker so feedback sounds never wait behind API calls
+        self._sound_executor = ThreadPoolExecutor(max_workers=1)
         self.processing_thread = threading.Thread(
             target=self._process_queue, daemon=True
         )
         self.processing_thread.start()
 
+        # Screen capture state, shared by every trigger. mss keeps its OS
+        # handles per thread, so the instance is created on the capturing thread.
+        self._sct = None
+        self._capture_lock = threading.Lock()
+        # A single encoder thread owns the reused encoded-image buffer
+        self._encode_executor = ThreadPoolExecutor(max_workers=1)
+        self._buffered = BytesIO()
+
         if knowledge_source_path:
             os.makedirs(knowledge_source_path, exist_ok=True)
 
+        # (date, handle) of the open knowledge file, reopened at midnight
+        self._kf_cache = (None, None)
+        self._knowledge_lock = threading.Lock()
+        # Only one entry streams into the file at a time; entries finished
+        # while it is live wait here and are written once it closes
+        self._live_entry = False
+        self._pending_entries = []
+
+        # Persistent analysis cache, keyed by a hash of the encoded image
+        self._cache_lock = threading.Lock()
+        self._cache_db = self._open_analysis_cache() if knowledge_source_path else None
+        self._cache = self._load_analysis_cache()
+
+        # Perceptual hash, analysis and monotonic time of the last analyzed
+        # screenshot; reused only within COALESCE_WINDOW
+        self._dhash_lock = threading.Lock()
+        self._last_dhash = None
+        self._last_analysis = None
+        self._last_analysis_at = 0.0
+
         # Set up hotkeys
         self.screenshot_hotkey = self._parse_hotkey(hotkey)
         self.clipboard_hotkey = self._parse_hotkey("cmd+z")
+        self._screenshot_mask = self._hotkey_mask(self.screenshot_hotkey)
+        self._clipboard_mask = self._hotkey_mask(self.clipboard_hotkey)
 
-    def _parse_hotkey(self, hotkey: str) -> set:
+    def _parse_hotkey(self, hotkey: str) -> frozenset:
         """
         Convert hotkey string to set of keys.
 
@@ -141,61 +432,389 @@ class HotkeyService:
             hotkey (str): String representation of hotkey (e.g., "cmd+x")
 
         Returns:
-            set: Set of individual keys
+            frozenset: Set of individual keys
         """
-        return set(hotkey.lower().replace("command+", "cmd+").split("+"))
+        return _parse_hotkey_cached(hotkey)
 
-    def _take_screenshot(self) -> str:
+    def _hotkey_mask(self, keys: frozenset) -> int:
         """
-        Capture screen and convert to base64.
+        Convert a set of keys to the bitmask matched against pressed keys.
+
+        Args:
+            keys (frozenset): Set of individual keys
 
         Returns:
-            str: Base64 encoded PNG image
+            int: Bitmask with one bit per key
+        """
+        mask = 0
+        for key in keys:
+            mask |= _key_bit(key)
+        return mask
+
+    def _grab_screen(self):
+        """
+        Capture the raw screen contents.
+
+        Returns:
+            Optional[mss.screenshot.ScreenShot]: Raw BGRA capture, or None on failure
         """
         try:
-            screenshot = pyscreenshot.grab()
-            buffered = BytesIO()
-            screenshot.save(buffered, format="PNG")
-            return base64.b64encode(buffered.getvalue()).decode()
+            with self._capture_lock:
+                if self._sct is None:
+                    self._sct = mss.mss()
+                return self._sct.grab(self._sct.monitors[0])
         except Exception as e:
             print(f"❌ Failed to take screenshot: {str(e)}")
-            return ""
+            return None
 
-    def _analyze_image(self, base64_img: str) -> str:
+    def _close_screen_capture(self) -> None:
+        """Close the mss instance, if one was created."""
+        with self._capture_lock:
+            if self._sct is None:
+                return
+            try:
+                self._sct.close()
+            except Exception as e:
+                # Handles owned by the listener thread may not be reachable here
+                print(f"Failed to close screen capture: {e}")
+            self._sct = None
+
+    def _encode_screenshot(self, raw) -> tuple:
         """
-        Analyze image using OpenAI's Vision API.
+        Downsize a raw capture to the model's tile limits and convert to base64.
+
+        Runs on the single encoder thread, which owns the reused output buffer.
+
+        Args:
+            raw (mss.screenshot.ScreenShot): Raw BGRA capture
+
+        Returns:
+            tuple: Base64 encoded WebP or JPEG image and its difference hash
+        """
+        try:
+            # Decode mss' own BGRX bytearray into RGB in one pass; raw.bgra and
+            # raw.rgb would each copy the whole frame first
+            screenshot = Image.frombuffer("RGB", raw.size, raw.raw, "raw", "BGRX", 0, 1)
+            # thumbnail() box-reduces by an integer factor by default (reducing_gap
+            # of 2.0), so LANCZOS only runs on an image close to the target size
+            screenshot.thumbnail(
+                _tile_target_size(*screenshot.size), Image.Resampling.LANCZOS
+            )
+            dhash = _dhash(screenshot)
+            self._buffered.seek(0)
+            self._buffered.truncate()
+            screenshot.save(
+                self._buffered, format=SCREENSHOT_FORMAT, **SCREENSHOT_SAVE_OPTIONS
+            )
+            # Encode from a view of the buffer rather than a getvalue() copy;
+            # the view must be released before the buffer is truncated again.
+            with self._buffered.getbuffer() as view:
+                return base64.b64encode(view).decode("ascii"), dhash
+        except Exception as e:
+            print(f"❌ Failed to encode screenshot: {str(e)}")
+            return "", None
+
+    def _encode_and_enqueue(self, raw) -> None:
+        """
+        Encode a raw capture and add it to the processing queue.
+
+        Args:
+            raw (mss.screenshot.ScreenShot): Raw BGRA capture
+        """
+        base64_img, dhash = self._encode_screenshot(raw)
+        if base64_img:
+            self._process_content(base64_img, "screenshot", dhash)
+
+    def _open_analysis_cache(self) -> Optional[sqlite3.Connection]:
+        """
+        Open the persistent analysis cache next to the knowledge files.
+
+        Returns:
+            Optional[sqlite3.Connection]: Cache connection, or None if unavailable
+        """
+        try:
+            db = sqlite3.connect(
+                os.path.join(knowledge_source_path, ANALYSIS_CACHE_FILE),
+                check_same_thread=False,
+            )
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                """CREATE TABLE IF NOT EXISTS cache (
+                    digest TEXT PRIMARY KEY,
+                    analysis TEXT NOT NULL,
+                    ts REAL NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0
+                )"""
+            )
+            db.commit()
+            return db
+        except sqlite3.Error as e:
+            print(f"⚠️ Analysis cache disabled: {str(e)}")
+            return None
+
+    def _load_analysis_cache(self) -> dict:
+        """
+        Load analyses persisted by earlier sessions into memory.
+
+        Returns:
+            dict: Analysis by image digest
+        """
+        if self._cache_db is None:
+            return {}
+
+        try:
+            cache = dict(self._cache_db.execute("SELECT digest, analysis FROM cache"))
+            if cache:
+                print(f"♻️ Loaded {len(cache)} cached analyses")
+            return cache
+        except sqlite3.Error as e:
+            print(f"⚠️ Failed to load analysis cache: {str(e)}")
+            return {}
+
+    def _cache_lookup(self, digest: str) -> Optional[str]:
+        """
+        Look up a previous analysis of an identical image.
+
+        Args:
+            digest (str): Hash of the encoded image
+
+        Returns:
+            Optional[str]: Cached analysis, or None on a miss
+        """
+        try:
+            with self._cache_lock:
+                # Checked under the lock, shutdown may close the cache concurrently
+                if self._cache_db is None:
+                    return None
+                analysis = self._cache.get(digest)
+                if analysis is None:
+                    return None
+                self._cache_db.execute(
+                    "UPDATE cache SET hit_count = hit_count + 1 WHERE digest = ?",
+                    (digest,),
+                )
+                self._cache_db.commit()
+                return analysis
+        except sqlite3.Error as e:
+            print(f"⚠️ Analysis cache lookup failed: {str(e)}")
+            return None
+
+    def _cache_store(self, digest: str, analysis: str) -> None:
+        """
+        Store an analysis, evicting the least frequently used entries beyond the cap.
+
+        Entries are evicted in batches so the cap is not enforced on every insert.
+
+        Args:
+            digest (str): Hash of the encoded image
+            analysis (str): Analysis to cache
+        """
+        try:
+            with self._cache_lock:
+                # Checked under the lock, shutdown may close the cache concurrently
+                if self._cache_db is None:
+                    return
+                self._cache_db.execute(
+                    "INSERT OR REPLACE INTO cache (digest, analysis, ts, hit_count) "
+                    "VALUES (?, ?, ?, 0)",
+                    (digest, analysis, time.time()),
+                )
+                self._cache[digest] = analysis
+                if len(self._cache) > ANALYSIS_CACHE_MAX_ENTRIES:
+                    evicted = self._cache_db.execute(
+                        "SELECT digest FROM cache ORDER BY hit_count ASC, ts ASC "
+                        "LIMIT ?",
+                        (ANALYSIS_CACHE_EVICT_BATCH,),
+                    ).fetchall()
+                    self._cache_db.executemany(
+                        "DELETE FROM cache WHERE digest = ?", evicted
+                    )
+                    for (evicted_digest,) in evicted:
+                        self._cache.pop(evicted_digest, None)
+                self._cache_db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️ Failed to cache analysis: {str(e)}")
+
+    def _close_analysis_cache(self) -> None:
+        """Close the analysis cache connection, if any."""
+        with self._cache_lock:
+            if self._cache_db is None:
+                return
+            self._cache_db.close()
+            self._cache_db = None
+
+    def _reuse_last_analysis(self, dhash: Optional[int]) -> Optional[str]:
+        """
+        Return the previous analysis if the screen has not visibly changed.
+
+        A 9x8 hash mostly captures page layout, so it is only trusted for a
+        capture taken shortly after the last one; exact repeats later on are
+        left to the content-addressed cache.
+
+        Args:
+            dhash (Optional[int]): Difference hash of the new screenshot
+
+        Returns:
+            Optional[str]: Previous analysis, or None if the screen differs
+        """
+        if dhash is None:
+            return None
+
+        with self._dhash_lock:
+            if self._last_analysis is None:
+                return None
+            if time.monotonic() - self._last_analysis_at > self.COALESCE_WINDOW:
+                self._last_dhash = None
+                self._last_analysis = None
+                return None
+            if _hamming(dhash, self._last_dhash) >= DHASH_THRESHOLD:
+                return None
+            return self._last_analysis
+
+    def _remember_analysis(self, dhash: Optional[int], analysis: str) -> None:
+        """
+        Record the latest successful screenshot analysis for perceptual dedup.
+
+        Args:
+            dhash (Optional[int]): Difference hash of the analyzed screenshot
+            analysis (str): Its analysis
+        """
+        if dhash is None:
+            return
+
+        with self._dhash_lock:
+            self._last_dhash = dhash
+            self._last_analysis = analysis
+            self._last_analysis_at = time.monotonic()
+
+    def _find_known_analysis(self, base64_img: str, dhash: Optional[int]) -> tuple:
+        """
+        Look for an existing analysis of a screenshot and append it to the knowledge file.
 
         Args:
             base64_img (str): Base64 encoded image
+            dhash (Optional[int]): Difference hash of the image, if known
+
+        Returns:
+            tuple: Cache digest of the image and the known analysis (or None)
+        """
+        previous = self._reuse_last_analysis(dhash)
+        if previous is not None:
+            print("🔁 Screen unchanged since last capture, reusing previous analysis")
+            self._append_to_knowledge(previous)
+            return None, previous
+
+        digest = hashlib.blake2b(base64_img.encode("ascii"), digest_size=16).hexdigest()
+        cached = self._cache_lookup(digest)
+        if cached is not None:
+            print("♻️ Identical screenshot analyzed before, reusing cached analysis")
+            self._remember_analysis(dhash, cached)
+            self._append_to_knowledge(cached)
+        return digest, cached
+
+    def _store_analysis(self, digest: str, dhash: Optional[int], analysis: str) -> None:
+        """
+        Record a fresh analysis in the analysis cache and for perceptual dedup.
+
+        Args:
+            digest (str): Cache digest of the image
+            dhash (Optional[int]): Difference hash of the image, if known
+            analysis (str): Analysis of the image
+        """
+        if analysis:
+            self._cache_store(digest, analysis)
+            self._remember_analysis(dhash, analysis)
+
+    def _request_analysis(self, prompt: str, base64_imgs: list) -> str:
+        """
+        Send screenshots to the vision model, streaming the answer into the knowledge file.
+
+        Args:
+            prompt (str): Instructions sent with the images
+            base64_imgs (list): Base64 encoded images
+
+        Returns:
+            str: Analysis in markdown format
+        """
+        response = openai_client.chat.completions.create(
+            model=VISION_MODEL,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        *[_image_part(base64_img) for base64_img in base64_imgs],
+                    ],
+                }
+            ],
+            stream=True,
+        )
+        return self._stream_to_knowledge(response)
+
+    def _analyze_image(self, base64_img: str, dhash: Optional[int] = None) -> str:
+        """
+        Analyze image using OpenAI's Vision API and append it to the knowledge file.
+
+        Fresh analyses are streamed into the knowledge file as they arrive.
+
+        Args:
+            base64_img (str): Base64 encoded image
+            dhash (Optional[int]): Difference hash of the image, if known
 
         Returns:
             str: Analysis in markdown format
         """
+        return self._analyze_images([(base64_img, dhash)])
+
+    def _analyze_images(self, images: list) -> str:
+        """
+        Analyze screenshots, sending every one not seen before in a single request.
+
+        Args:
+            images (list): (base64 image, difference hash) pairs
+
+        Returns:
+            str: Analyses in markdown format, one per screenshot
+        """
         try:
-            response = openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": SYSTEM_PROMPT},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{base64_img}"
-                                },
-                            },
-                        ],
-                    }
-                ],
-            )
-            return response.choices[0].message.content
+            analyses = [None] * len(images)
+            misses = []
+            for i, (base64_img, dhash) in enumerate(images):
+                digest, known = self._find_known_analysis(base64_img, dhash)
+                if known is not None:
+                    analyses[i] = known
+                else:
+                    misses.append((i, base64_img, dhash, digest))
+
+            if len(misses) == 1:
+                i, base64_img, dhash, digest = misses[0]
+                analyses[i] = self._request_analysis(SYSTEM_PROMPT, [base64_img])
+                self._store_analysis(digest, dhash, analyses[i])
+            elif misses:
+                combined = self._request_analysis(
+                    BATCH_PROMPT, [base64_img for _, base64_img, _, _ in misses]
+                )
+                parts = _split_analyses(combined)
+                if len(parts) == len(misses):
+                    for (i, _, dhash, digest), part in zip(misses, parts):
+                        analyses[i] = part
+                        self._store_analysis(digest, dhash, part)
+                else:
+                    # Sections can't be matched to screenshots, so keep it uncached
+                    analyses[misses[0][0]] = combined
+
+            return "\n\n".join(analysis for analysis in analyses if analysis)
         except Exception as e:
-            return f"❌ Failed to analyze image: {str(e)}"
+            analysis = f"❌ Failed to analyze image: {str(e)}"
+            self._append_to_knowledge(analysis)
+            return analysis
 
-    def _get_knowledge_file(self) -> str:
+    def _get_knowledge_file(self, today: str) -> str:
         """
-        Get path to today's knowledge file.
+        Get path to the knowledge file for a given day.
+
+        Args:
+            today (str): Day in YYYYMMDD format
 
         Returns:
             str: Path to knowledge file
@@ -206,9 +825,151 @@ class HotkeyService:
         if not knowledge_source_path:
             raise ValueError("KNOWLEDGE_SOURCE_PATH not set in environment")
 
-        today = datetime.now().strftime("%Y%m%d")
         return os.path.join(knowledge_source_path, f"running_knowledge_{today}.md")
 
+    def _get_knowledge_handle(self, now: datetime):
+        """
+        Get the open handle to today's knowledge file, rolling over at midnight.
+
+        Must be called with the knowledge lock held.
+
+        Args:
+            now (datetime): Current time
+
+        Returns:
+            TextIO: Line-buffered handle opened for appending
+        """
+        today = now.strftime("%Y%m%d")
+        cached_day, handle = self._kf_cache
+        if cached_day != today:
+            if handle:
+                handle.close()
+            handle = open(
+                self._get_knowledge_file(today), "a", encoding="utf-8", buffering=1
+            )
+            self._kf_cache = (today, handle)
+        return handle
+
+    def _close_knowledge_file(self) -> None:
+        """Write any buffered entries and close the cached knowledge file handle."""
+        with self._knowledge_lock:
+            if self._pending_entries:
+                handle = self._get_knowledge_handle(datetime.now())
+                handle.write("".join(self._pending_entries))
+                self._pending_entries.clear()
+            _, handle = self._kf_cache
+            if handle:
+                handle.close()
+            self._kf_cache = (None, None)
+
+    def _write_or_defer_entry(self, entry: str, now: datetime) -> Optional[str]:
+        """
+        Write a complete entry, or buffer it while another entry is streaming.
+
+        Args:
+            entry (str): Entry text including its header and footer
+            now (datetime): Time the entry was opened
+
+        Returns:
+            Optional[str]: Path written to, or None if the entry was buffered
+        """
+        with self._knowledge_lock:
+            if self._live_entry:
+                self._pending_entries.append(entry)
+                return None
+            f = self._get_knowledge_handle(now)
+            f.write(entry)
+            return f.name
+
+    @contextmanager
+    def _knowledge_entry(self):
+        """
+        Open a timestamped entry in today's knowledge file.
+
+        The first entry opened writes through to the file as text arrives.
+        Entries opened while it is live are collected in memory and written
+        whole after it closes, so entries never interleave and no writer
+        waits on another writer's network stream. The trade-off is that those
+        entries reach the file only once the live stream ends (or times out).
+        The knowledge lock is held only for the individual writes.
+
+        Yields:
+            Callable: Function appending text to the entry (a no-op if
+            KNOWLEDGE_SOURCE_PATH is not set)
+        """
+        if not knowledge_source_path:
+            yield lambda text: None
+            return
+
+        now = datetime.now()
+        header = f"\n\n## Captured at {now:%H:%M:%S}\n\n"
+        footer = "\n\n---\n"
+        # File errors are reported once and never abort the caller, so a
+        # streamed analysis is still read, returned and cached
+        save_error = None
+
+        with self._knowledge_lock:
+            live = not self._live_entry
+            if live:
+                try:
+                    f = self._get_knowledge_handle(now)
+                    f.write(header)
+                    self._live_entry = True
+                except OSError as e:
+                    save_error = e
+
+        if save_error is not None:
+            print(f"❌ Failed to save analysis: {str(save_error)}")
+            yield lambda text: None
+            return
+
+        if not live:
+            pieces = [header]
+            try:
+                yield pieces.append
+            finally:
+                pieces.append(footer)
+                try:
+                    knowledge_file = self._write_or_defer_entry("".join(pieces), now)
+                except OSError as e:
+                    save_error = e
+            if save_error is not None:
+                print(f"❌ Failed to save analysis: {str(save_error)}")
+            elif knowledge_file:
+                print(f"📝 Analysis appended to {knowledge_file}")
+            else:
+                print("📝 Analysis will be appended after the entry being streamed")
+            return
+
+        def write(text: str) -> None:
+            nonlocal save_error
+            if save_error is not None:
+                return
+            with self._knowledge_lock:
+                try:
+                    f.write(text)
+                except OSError as e:
+                    save_error = e
+
+        try:
+            yield write
+        finally:
+            with self._knowledge_lock:
+                try:
+                    f.write(footer)
+                    if self._pending_entries:
+                        f.write("".join(self._pending_entries))
+                        self._pending_entries.clear()
+                except OSError as e:
+                    save_error = save_error or e
+                finally:
+                    self._live_entry = False
+
+        if save_error is not None:
+            print(f"❌ Failed to save analysis: {str(save_error)}")
+        else:
+            print(f"📝 Analysis appended to {f.name}")
+
     def _append_to_knowledge(self, analysis: str) -> None:
         """
         Append analysis to knowledge file with timestamp.
@@ -217,18 +978,32 @@ class HotkeyService:
             analysis (str): Analysis to append
         """
         try:
-            knowledge_file = self._get_knowledge_file()
-            timestamp = datetime.now().strftime("%H:%M:%S")
-
-            with open(knowledge_file, "a", encoding="utf-8") as f:
-                f.write(f"\n\n## Captured at {timestamp}\n\n")
-                f.write(analysis)
-                f.write("\n\n---\n")
-
-            print(f"📝 Analysis appended to {knowledge_file}")
+            with self._knowledge_entry() as write:
+                write(analysis)
         except Exception as e:
             print(f"❌ Failed to save analysis: {str(e)}")
 
+    def _stream_to_knowledge(self, response) -> str:
+        """
+        Write a streamed completion into the knowledge file as it arrives.
+
+        Args:
+            response: Streaming chat completion
+
+        Returns:
+            str: Full analysis text
+        """
+        pieces = []
+        with self._knowledge_entry() as write:
+            for chunk in response:
+                if not chunk.choices:
+                    continue
+                piece = chunk.choices[0].delta.content or ""
+                if piece:
+                    write(piece)
+                    pieces.append(piece)
+        return "".join(pieces)
+
     def play_sound(self, sound_type: str) -> None:
         """
         Play system sound based on event type.
@@ -238,12 +1013,11 @@ class HotkeyService:
         """
         try:
             if platform.system() == "Darwin":  # macOS
-                if sound_type == "start":
-                    os.system("afplay /System/Library/Sounds/Ping.aiff")
-                elif sound_type == "complete":
-                    os.system("afplay /System/Library/Sounds/Glass.aiff")
-                elif sound_type == "error":
-                    os.system("afplay /System/Library/Sounds/Basso.aiff")
+                sound_id = system_sound_ids.get(sound_type)
+                if sound_id is not None:
+                    audio_toolbox.AudioServicesPlaySystemSound(sound_id)
+                elif sound_type in SOUND_FILES:
+                    os.system(f"afplay {SOUND_FILES[sound_type]}")
             elif platform.system() == "Windows":
                 if sound_type == "start":
                     winsound.PlaySound("SystemAsterisk", winsound.SND_ALIAS)
@@ -255,28 +1029,57 @@ class HotkeyService:
             print(f"Failed to play sound: {e}")
 
     def _process_queue(self):
-        """Process items from the queue."""
+        """Process items from the queue, batching screenshots waiting together."""
         while True:
+            self._worker_slots.acquire()
             try:
-                content, source = self.processing_queue.get(timeout=1)
-                if content:
-                    future = self.executor.submit(
-                        self._process_content_item, content, source
-                    )
-                    future.add_done_callback(self._on_analysis_complete)
-                    self.processing_queue.task_done()
+                item = self.processing_queue.get(timeout=1)
             except queue.Empty:
+                self._worker_slots.release()
                 continue
+
+            items = [item]
+            try:
+                if item[1] == "screenshot":
+                    items += self._drain_screenshots(self.MAX_BATCH_SIZE - 1)
+
+                if len(items) > 1:
+                    future = self.executor.submit(
+                        self._process_screenshot_batch, items
+                    )
+                else:
+                    future = self.executor.submit(self._process_content_item, *item)
+                future.add_done_callback(self._release_worker_slot)
+                future.add_done_callback(self._on_analysis_complete)
             except Exception as e:
+                self._worker_slots.release()
                 print(f"Error processing queue: {e}")
                 time.sleep(1)
+            finally:
+                for _ in items:
+                    self.processing_queue.task_done()
+
+    def _release_worker_slot(self, future) -> None:
+        """
+        Free the worker slot held by a finished task.
 
-    def _process_content_item(self, content: str, source: str) -> tuple[str, bool]:
+        Args:
+            future: Completed future
+        """
+        self._worker_slots.release()
+
+    def _process_content_item(
+        self,
+        content: str,
+        source: str,
+        dhash: Optional[int] = None,
+        enqueued_at: Optional[float] = None,
+    ) -> tuple[str, bool]:
         """Process a single content item."""
         try:
             print(f"📝 Processing {source}...")
             if source == "screenshot":
-                analysis = self._analyze_image(content)
+                analysis = self._analyze_image(content, dhash)
             else:  # clipboard
                 # Just format the clipboard content with timestamp
                 timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -285,11 +1088,91 @@ class HotkeyService:
 {content}
 
 ---"""
+                self._append_to_knowledge(analysis)
             success = True  # Always true for clipboard content
             return analysis, success
         except Exception as e:
             print(f"Error processing {source}: {e}")
+            self._append_to_knowledge(str(e))
             return str(e), False
+        finally:
+            if source == "screenshot":
+                self._finish_screenshot(enqueued_at)
+
+    def _drain_screenshots(self, limit: int) -> list:
+        """
+        Take up to `limit` screenshots from the head of the queue without blocking.
+
+        Stops at the first non-screenshot item so it keeps its place in line.
+        Only the processing thread consumes the queue, so the peeked head
+        cannot change before it is taken.
+
+        Args:
+            limit (int): Maximum number of screenshots to take
+
+        Returns:
+            list: Queue items in arrival order
+        """
+        items = []
+        while len(items) < limit:
+            with self.processing_queue.mutex:
+                pending = self.processing_queue.queue
+                if not pending or pending[0][1] != "screenshot":
+                    break
+            items.append(self.processing_queue.get_nowait())
+        return items
+
+    def _process_screenshot_batch(self, items: list) -> tuple[str, bool]:
+        """Process several queued screenshots with a single vision request."""
+        try:
+            print(f"📝 Processing {len(items)} screenshots together...")
+            analysis = self._analyze_images(
+                [(content, dhash) for content, _, dhash, _ in items]
+            )
+            return analysis, True
+        except Exception as e:
+            print(f"Error processing screenshots: {e}")
+            self._append_to_knowledge(str(e))
+            return str(e), False
+        finally:
+            for _, _, _, enqueued_at in items:
+                self._finish_screenshot(enqueued_at)
+
+    def _is_burst_duplicate(self, dhash: Optional[int], now: float) -> bool:
+        """
+        Check whether the same screen is already queued or being analyzed.
+
+        Must be called with the queue lock held.
+
+        Args:
+            dhash (Optional[int]): Difference hash of the new screenshot
+            now (float): Monotonic time of the new capture
+
+        Returns:
+            bool: True if the capture should be dropped
+        """
+        if self._inflight_screenshot is None or dhash is None:
+            return False
+
+        inflight_dhash, enqueued_at = self._inflight_screenshot
+        return (
+            now - enqueued_at < self.COALESCE_WINDOW
+            and _hamming(dhash, inflight_dhash) < DHASH_THRESHOLD
+        )
+
+    def _finish_screenshot(self, enqueued_at: Optional[float]) -> None:
+        """
+        Clear the in-flight marker once its screenshot has been processed.
+
+        Args:
+            enqueued_at (Optional[float]): Monotonic enqueue time of the screenshot
+        """
+        with self._queue_lock:
+            if (
+                self._inflight_screenshot is not None
+                and self._inflight_screenshot[1] == enqueued_at
+            ):
+                self._inflight_screenshot = None
 
     def _analyze_text(self, text: str) -> str:
         """Analyze clipboard text content."""
@@ -299,7 +1182,7 @@ class HotkeyService:
                 messages=[
                     {
                         "role": "user",
-                        "content": f"{SYSTEM_PROMPT}\n\nAnalyze this text:\n{text}",
+                        "content": TEXT_PROMPT_PREFIX + text,
                     }
                 ],
             )
@@ -308,11 +1191,33 @@ class HotkeyService:
             return f"❌ Failed to analyze text: {str(e)}"
 
     def _process_content(
-        self, content: str, source: Literal["screenshot", "clipboard"]
+        self,
+        content: str,
+        source: Literal["screenshot", "clipboard"],
+        dhash: Optional[int] = None,
     ) -> None:
         """Process content from either screenshot or clipboard."""
         try:
-            self.processing_queue.put((content, source), timeout=1)
+            enqueued_at = time.monotonic()
+            with self._queue_lock:
+                if source == "screenshot" and self._is_burst_duplicate(
+                    dhash, enqueued_at
+                ):
+                    print("⏭️ Same screen is already being analyzed, skipping capture")
+                    return
+                if source == "screenshot":
+                    self._inflight_screenshot = (dhash, enqueued_at)
+
+            # Block outside the lock: workers need it in _finish_screenshot
+            # before they can free a slot and let the queue drain
+            try:
+                self.processing_queue.put(
+                    (content, source, dhash, enqueued_at), timeout=1
+                )
+            except queue.Full:
+                if source == "screenshot":
+                    self._finish_screenshot(enqueued_at)
+                raise
             queue_size = self.processing_queue.qsize()
             print(
                 f"📥 {source.title()} content added to processing queue... ({queue_size}/{self.MAX_QUEUE_SIZE})"
@@ -342,11 +1247,13 @@ class HotkeyService:
     def _screenshot_callback(self) -> None:
         """Handle screenshot processing."""
         print(f"\n🎯 Screenshot triggered!")
-        self.play_sound("start")
+        # Play the start sound while the screen is being captured
+        self._sound_executor.submit(self.play_sound, "start")
 
-        base64_img = self._take_screenshot()
-        if base64_img:
-            self._process_content(base64_img, "screenshot")
+        # Encoding happens off the keyboard listener thread
+        raw = self._grab_screen()
+        if raw is not None:
+            self._encode_executor.submit(self._encode_and_enqueue, raw)
 
     def _on_press(self, key) -> None:
         """
@@ -356,23 +1263,24 @@ class HotkeyService:
             key: The key that was pressed
         """
         try:
-            current_time = time.time()
+            now = time.monotonic_ns()
 
-            if hasattr(key, "char"):
-                self.current_keys.add(key.char)
-            elif key == keyboard.Key.cmd:
-                self.current_keys.add("cmd")
+            char = getattr(key, "char", None)
+            if char is not None:
+                self._mask |= _key_bit(char)
+            elif key is _CMD_KEY:
+                self._mask |= KEY_BITS["cmd"]
 
             # Check both hotkeys
-            if current_time - self.last_trigger_time > self.TRIGGER_COOLDOWN:
-                if self.current_keys == self.screenshot_hotkey:
+            if now - self._last_trigger_ns > self._cooldown_ns:
+                if self._mask == self._screenshot_mask:
                     self._screenshot_callback()
-                    self.last_trigger_time = current_time
-                    self.current_keys.clear()
-                elif self.current_keys == self.clipboard_hotkey:
+                    self._last_trigger_ns = now
+                    self._mask = 0
+                elif self._mask == self._clipboard_mask:
                     self._clipboard_callback()
-                    self.last_trigger_time = current_time
-                    self.current_keys.clear()
+                    self._last_trigger_ns = now
+                    self._mask = 0
         except AttributeError:
             pass
 
@@ -385,14 +1293,15 @@ class HotkeyService:
         """
         try:
             # Remove released key
-            if hasattr(key, "char"):
-                self.current_keys.discard(key.char)
-            elif key == keyboard.Key.cmd:
-                self.current_keys.discard("cmd")
-
-            # If all hotkey keys are released, clear the set
-            if not any(k in self.current_keys for k in self.hotkey):
-                self.current_keys.clear()
+            char = getattr(key, "char", None)
+            if char is not None:
+                self._mask &= ~_key_bit(char)
+            elif key is _CMD_KEY:
+                self._mask &= ~KEY_BITS["cmd"]
+
+            # If all hotkey keys are released, clear the mask
+            if not self._mask & self._screenshot_mask:
+                self._mask = 0
         except AttributeError:
             pass
 
@@ -409,13 +1318,24 @@ class HotkeyService:
 
         except KeyboardInterrupt:
             print("\n👋 Shutting down AVR...")
-            self.executor.shutdown(wait=False)  # Shutdown thread pool
+            self._shutdown()
             sys.exit(0)
         except Exception as e:
             print(f"❌ Error: {str(e)}")
-            self.executor.shutdown(wait=False)
+            self._shutdown()
             sys.exit(1)
 
+    def _shutdown(self) -> None:
+        """Finish in-progress analyses, then release pools, files and connections."""
+        self._sound_executor.shutdown(wait=False)
+        self._encode_executor.shutdown(wait=True)
+        # Let running analyses finish streaming before their connection is closed
+        self.executor.shutdown(wait=True)
+        self._close_screen_capture()
+        self._close_knowledge_file()
+        self._close_analysis_cache()
+        http_client.close()
+
     def _on_analysis_complete(self, future) -> None:
         """
         Handle completed analysis.
@@ -435,8 +1355,8 @@ class HotkeyService:
             print(analysis)
             print("\n" + "=" * 50)
 
+            # Content was already appended to the knowledge file while processing
             if knowledge_source_path:
-                self._append_to_knowledge(analysis)
                 self.play_sound("complete")
             else:
                 self.play_sound("error")